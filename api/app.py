@@ -1,11 +1,22 @@
 # api/app.py
 from __future__ import annotations
  
+import hashlib
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
 from pathlib import Path
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import joblib
 import numpy as np
+import orjson
+from werkzeug.exceptions import RequestEntityTooLarge
  
  
 # -----------------------------
@@ -16,6 +27,9 @@ MODEL_PATH = (BASE_DIR / "../models/best_model.pkl").resolve()
 SCALER_PATH = (BASE_DIR / "../models/scaler.pkl").resolve()
  
 N_FEATURES = 200
+# float32 sur tout le chemin requête : moitié moins d'octets pour scaler / modèle / clés de cache
+FEATURE_DTYPE = np.float32
+_FEATURE_MAX = float(np.finfo(FEATURE_DTYPE).max)
 DEFAULT_THRESHOLD = 0.5
  
 # Ajustement agent (borné)
@@ -26,16 +40,64 @@ AGENT_ADJ_MAX = +0.30
 DEFAULT_MAX_DEBT_RATIO_AFTER = 0.45   # taux endettement après crédit
 DEFAULT_MIN_RESTE_A_VIVRE_AFTER = 0   # reste à vivre après crédit >= 0
  
+# Taille max d'un body JSON (un dossier /predict fait quelques centaines d'octets)
+MAX_BODY_BYTES = 64 * 1024
+ 
 # Paramètre de simulation crédit (si tu n'as pas de taux issu modèle)
 DEFAULT_TAUX_ANNUEL = 0.035  # 3.5%
+
+# Motif déterministe des features 28..199 (ajouté à base_mix), précalculé une fois
+_TAIL_PATTERN = np.array(
+    [(i % 7) * 0.03 - (i % 5) * 0.02 for i in range(28, N_FEATURES)]
+)
+
+# One-hot : valeur -> colonne de feature (une recherche dict au lieu de N comparaisons)
+_STATUT_COL = {
+    name: 6 + i for i, name in enumerate(
+        ["CDI", "CDD", "Sans emploi", "Étudiant", "Fonctionnaire", "Indépendant", "Retraité"]
+    )
+}
+_OBJET_COL = {
+    name: 22 + i for i, name in enumerate(
+        ["Achat immobilier", "Travaux", "Véhicule", "Consommation", "Trésorerie", "Autre"]
+    )
+}
+
+# Cache des prédictions (clé = bytes du vecteur de features)
+PRED_CACHE_SIZE = 8192
+# 2e niveau, sur disque (SQLite) : partagé entre workers et conservé au redémarrage.
+# Opt-in ("" = désactivé) : mesuré ~40 µs pour scorer sans cache disque, ~160-250 µs
+# pour un miss (get + set SQLite), ~12 µs pour un hit -> rentable seulement au-delà
+# d'environ 80 % de hits, loin du trafic interactif (déjà mis en cache côté Streamlit).
+PRED_CACHE_DIR = os.environ.get("PRED_CACHE_DIR", "")
+PRED_CACHE_SIZE_LIMIT = int(2e9)  # octets
+
+# Micro-batching des /predict concurrents d'un worker (gevent ou gthread) : fenêtre en ms, 0 = désactivé
+MICROBATCH_WINDOW_MS = float(os.environ.get("MICROBATCH_WINDOW_MS", 0))
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", 64))
  
  
 # -----------------------------
 # App init + load artifacts once
 # -----------------------------
 
+class ORJSONProvider(JSONProvider):
+    """
+    Sérialisation JSON via orjson (C) au lieu du module json standard.
+    OPT_SERIALIZE_NUMPY : les ndarray / scalaires numpy passent sans conversion float().
+    """
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+ 
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+ 
+ 
 app = Flask(__name__)
-
+app.json = ORJSONProvider(app)
+# au-delà, la lecture du body lève RequestEntityTooLarge (413) au lieu d'être bufferisée
+app.config["MAX_CONTENT_LENGTH"] = MAX_BODY_BYTES
+ 
 # Autoriser toutes les origines (pour tester)
 CORS(
     app,
@@ -47,19 +109,81 @@ CORS(
 
 
  
+def _load_artifact(path: Path):
+    """
+    Charge un artefact joblib en mémoire mappée (lecture seule) : les arrays numpy
+    sont des pages partagées entre workers gunicorn (preload + fork) au lieu d'une
+    copie par worker. Repli sur un chargement classique si le fichier ne s'y prête pas
+    (ex. dump compressé -> re-dumper avec joblib.dump(obj, path, compress=0)).
+    """
+    try:
+        return joblib.load(path, mmap_mode="r")
+    except Exception:
+        return joblib.load(path)
+ 
+ 
 try:
-    model = joblib.load(MODEL_PATH)
+    model = _load_artifact(MODEL_PATH)
 except Exception as e:
     raise RuntimeError(f"Impossible de charger le modèle: {MODEL_PATH}. Détail: {e}")
  
 try:
-    scaler = joblib.load(SCALER_PATH)
+    scaler = _load_artifact(SCALER_PATH)
 except Exception:
     scaler = None
  
 MODEL_TYPE = model.__class__.__name__
 USES_SCALER = scaler is not None
  
+# Pipeline "précompilé" pour le single-row : on extrait une fois les paramètres
+# utiles pour éviter la validation sklearn (check_array, feature names...) à chaque requête.
+if USES_SCALER and scaler.__class__.__name__ == "StandardScaler":
+    SCALER_MEAN = np.asarray(scaler.mean_ if scaler.with_mean else 0.0, dtype=FEATURE_DTYPE)
+    SCALER_SCALE = np.asarray(scaler.scale_ if scaler.with_std else 1.0, dtype=FEATURE_DTYPE)
+else:
+    SCALER_MEAN = SCALER_SCALE = None
+ 
+# LGBMClassifier binaire : le Booster natif renvoie directement la proba classe 1
+if MODEL_TYPE == "LGBMClassifier" and getattr(model, "objective_", None) == "binary":
+    BOOSTER = model.booster_
+else:
+    BOOSTER = None
+ 
+# LogisticRegression binaire : le StandardScaler est replié dans les coefficients
+#   w' = w / scale ; b' = b - sum(w * mean / scale)  ->  un seul produit scalaire par requête
+LINEAR_W = LINEAR_B = None
+if MODEL_TYPE == "LogisticRegression" and np.shape(getattr(model, "coef_", None))[:1] == (1,):
+    if SCALER_MEAN is not None:
+        LINEAR_W = (model.coef_[0] / SCALER_SCALE).astype(FEATURE_DTYPE)
+        LINEAR_B = float(model.intercept_[0] - (model.coef_[0] * SCALER_MEAN / SCALER_SCALE).sum())
+    elif not USES_SCALER:
+        LINEAR_W = model.coef_[0].astype(FEATURE_DTYPE)
+        LINEAR_B = float(model.intercept_[0])
+ 
+# Cache disque : les clés sont préfixées par l'empreinte des artefacts pour ne jamais
+# resservir un score calculé par un ancien modèle/scaler après redéploiement.
+if PRED_CACHE_DIR:
+    _artifacts_hash = hashlib.blake2b(MODEL_PATH.read_bytes(), digest_size=8)
+    if USES_SCALER:
+        _artifacts_hash.update(SCALER_PATH.read_bytes())
+    MODEL_TAG = _artifacts_hash.digest()
+ 
+    try:
+        # import ici : diskcache n'est requis que si le cache disque est activé
+        from diskcache import Cache
+
+        PRED_DISK_CACHE = Cache(PRED_CACHE_DIR, size_limit=PRED_CACHE_SIZE_LIMIT, timeout=1)
+        # ferme la connexion SQLite ouverte pendant le preload : chaque worker forké ouvre la sienne
+        PRED_DISK_CACHE.close()
+    except Exception as e:
+        # cache best-effort : diskcache absent ou dossier non inscriptible ne doit pas
+        # empêcher l'API de démarrer
+        app.logger.warning("Cache disque désactivé (%s) : %s", PRED_CACHE_DIR, e)
+        PRED_DISK_CACHE = None
+else:
+    MODEL_TAG = b""
+    PRED_DISK_CACHE = None
+ 
  
 # -----------------------------
 # Helpers
@@ -101,48 +225,44 @@ def _calc_mensualite(montant: float, duree_mois: int, taux_annuel: float) -> flo
     if taux_mensuel <= 0:
         return montant / n
  
-    # formule standard
-    return montant * (taux_mensuel * (1 + taux_mensuel) ** n) / ((1 + taux_mensuel) ** n - 1)
- 
- 
-def _business_to_features(b: dict, mensualite_credit: float, taux_endettement_after: float, reste_a_vivre_after: float) -> np.ndarray:
+    # formule standard, (1 + t)^n calculé une seule fois
+    p = math.pow(1.0 + taux_mensuel, n)
+    return montant * taux_mensuel * p / (p - 1.0)
+ 
+ 
+def _business_to_features(
+    b: dict,
+    revenu: float,
+    charges: float,
+    credits: float,
+    montant_credit: float,
+    duree_credit: int,
+    objet_credit: str,
+    mensualite_credit: float,
+    taux_endettement_after: float,
+    reste_a_vivre_after: float,
+) -> np.ndarray:
     """
     Convertit le JSON métier (y compris crédit demandé) vers un array (1, 200).
     Mapping déterministe + ratios utiles + one-hot statut + info crédit.
+    Les champs déjà convertis par /predict sont passés tels quels (pas de 2e parsing).
     """
     age = _to_float(b.get("age", 30))
-    revenu = _to_float(b.get("revenu_mensuel", 0))
-    charges = _to_float(b.get("charges_mensuelles", 0))
-    credits = _to_float(b.get("credits_encours", 0))
     anciennete = _to_float(b.get("anciennete_pro", 0))
     annees_res = _to_float(b.get("annees_residence", 0))
  
     statut = str(b.get("statut_pro", "")).strip()
  
-    montant_credit = _to_float(b.get("montant_credit", 0))
-    duree_credit = _to_int(b.get("duree_credit", 0))
-    objet_credit = str(b.get("objet_credit", "")).strip()
- 
     denom = max(revenu, 1.0)
     taux_charges = charges / denom
     taux_credits = credits / denom
     taux_endettement_before = (charges + credits) / denom
     reste_a_vivre_before = revenu - charges - credits
  
-    # One-hot statut (simple)
-    is_cdi = 1.0 if statut == "CDI" else 0.0
-    is_cdd = 1.0 if statut == "CDD" else 0.0
-    is_sans_emploi = 1.0 if statut == "Sans emploi" else 0.0
-    is_etudiant = 1.0 if statut == "Étudiant" else 0.0
-    is_fonctionnaire = 1.0 if statut == "Fonctionnaire" else 0.0
-    is_independant = 1.0 if statut == "Indépendant" else 0.0
-    is_retraite = 1.0 if statut == "Retraité" else 0.0
- 
-    # One-hot objet (light)
-    obj_map = ["Achat immobilier", "Travaux", "Véhicule", "Consommation", "Trésorerie", "Autre"]
-    obj_oh = [1.0 if objet_credit == o else 0.0 for o in obj_map]
- 
-    feats = np.zeros(N_FEATURES, dtype=float)
+    # buffer (1, 200) alloué une seule fois, rempli en place (pas de reshape/copie) ;
+    # en float64 comme le calcul métier, converti en FEATURE_DTYPE une seule fois à la fin
+    out = np.zeros((1, N_FEATURES))
+    feats = out[0]
  
     # --- features explicables (0..29)
     feats[0] = age
@@ -152,13 +272,12 @@ def _business_to_features(b: dict, mensualite_credit: float, taux_endettement_af
     feats[4] = anciennete
     feats[5] = annees_res
  
-    feats[6] = is_cdi
-    feats[7] = is_cdd
-    feats[8] = is_sans_emploi
-    feats[9] = is_etudiant
-    feats[10] = is_fonctionnaire
-    feats[11] = is_independant
-    feats[12] = is_retraite
+    # one-hot statut (6..12) : le buffer est à zéro, une seule case à 1
+    i_statut = _STATUT_COL.get(statut)
+    if i_statut is not None:
+        feats[i_statut] = 1.0
+    is_cdi = 1.0 if statut == "CDI" else 0.0
+    is_sans_emploi = 1.0 if statut == "Sans emploi" else 0.0
  
     feats[13] = taux_charges
     feats[14] = taux_credits
@@ -175,9 +294,9 @@ def _business_to_features(b: dict, mensualite_credit: float, taux_endettement_af
     feats[21] = float(reste_a_vivre_after)
  
     # objet one-hot (22..27)
-    for i, v in enumerate(obj_oh):
-        if 22 + i < N_FEATURES:
-            feats[22 + i] = v
+    i_objet = _OBJET_COL.get(objet_credit)
+    if i_objet is not None:
+        feats[i_objet] = 1.0
  
     # --- remplissage déterministe du reste
     base_mix = (
@@ -193,13 +312,164 @@ def _business_to_features(b: dict, mensualite_credit: float, taux_endettement_af
         - taux_endettement_after * 0.5
         + (reste_a_vivre_after / max(revenu, 1.0)) * 0.2
     )
-    for i in range(28, N_FEATURES):
-        feats[i] = base_mix + (i % 7) * 0.03 - (i % 5) * 0.02
+    feats[28:] = base_mix + _TAIL_PATTERN
+ 
+    # une seule réduction : un NaN/Inf rend la somme non finie. Le masque élément par
+    # élément n'est calculé que dans ce cas (index fautif, ou simple overflow de la somme).
+    # Seul le 1er index est renvoyé au client : un NaN d'entrée se propage à base_mix (28..199).
+    if not math.isfinite(out.sum()):
+        bad = np.flatnonzero(~np.isfinite(feats))
+        if bad.size:
+            raise ValueError(f"NaN/Inf détecté dans les features (index {int(bad[0])})")
+ 
+    # valeurs finies hors plage float32 (ex. revenu 1e39) saturées à ±max au lieu de
+    # devenir inf : toujours scorées, au-delà de tous les seuils des arbres comme en float64
+    np.clip(out, -_FEATURE_MAX, _FEATURE_MAX, out=out)
+    return out.astype(FEATURE_DTYPE)
+ 
+ 
+@lru_cache(maxsize=PRED_CACHE_SIZE)
+def _cached_risk_score(key: bytes) -> float:
+    """
+    Évalue le modèle pour un vecteur sérialisé (cf. _predict_risk_score).
+    Les payloads identiques ne repassent pas par scaler + predict_proba :
+    LRU en mémoire (par worker), puis cache disque partagé, puis modèle.
+    """
+    if PRED_DISK_CACHE is None:
+        return _score_key(key)
+ 
+    disk_key = MODEL_TAG + hashlib.blake2b(key, digest_size=16).digest()
+    try:
+        score = PRED_DISK_CACHE.get(disk_key)
+    except Exception:
+        score = None
+    if score is not None:
+        return score
+ 
+    score = _score_key(key)
+    try:
+        PRED_DISK_CACHE.set(disk_key, score)
+    except Exception:
+        pass  # cache best-effort : une erreur disque ne doit pas faire échouer /predict
+    return score
+ 
+ 
+def _score_key(key: bytes) -> float:
+    x = np.frombuffer(key, dtype=FEATURE_DTYPE).reshape(1, -1)
+    if PRED_BATCHER is not None:
+        return PRED_BATCHER.submit(x[0])
+    if LINEAR_W is not None:
+        return _sigmoid(float(x[0] @ LINEAR_W) + LINEAR_B)
+    return _model_proba(_scale(x))
+ 
+ 
+def _sigmoid(z: float) -> float:
+    # forme stable (pas d'overflow de exp pour |z| grand)
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
  
-    if not np.isfinite(feats).all():
-        raise ValueError("NaN/Inf détecté dans les features")
  
-    return feats.reshape(1, -1)
+def _scale(x: np.ndarray) -> np.ndarray:
+    if not USES_SCALER:
+        return x
+    if SCALER_MEAN is not None:
+        # équivalent StandardScaler.transform (scale_ a déjà ses zéros remplacés par 1)
+        return (x - SCALER_MEAN) / SCALER_SCALE
+    return scaler.transform(x)
+ 
+ 
+def _model_proba(x_in: np.ndarray) -> float:
+    if BOOSTER is not None:
+        # 1 ligne : on évite de lancer une équipe OpenMP sur tous les cœurs à chaque appel
+        return float(BOOSTER.predict(x_in, num_threads=1)[0])
+    return float(model.predict_proba(x_in)[0, 1])
+ 
+ 
+def _predict_rows(X: np.ndarray) -> np.ndarray:
+    """
+    Proba classe 1 pour un lot (K, 200) en un seul appel modèle.
+    """
+    if LINEAR_W is not None:
+        return 0.5 * (1.0 + np.tanh(0.5 * (X @ LINEAR_W + LINEAR_B)))
+    x_in = _scale(X)
+    if BOOSTER is not None:
+        return BOOSTER.predict(x_in)
+    return model.predict_proba(x_in)[:, 1]
+ 
+ 
+class _MicroBatcher:
+    """
+    Regroupe les requêtes single-row concurrentes d'un worker en un seul
+    _predict_rows (K, 200) : on attend au plus `window_s` ou `max_size` lignes.
+    Le thread est démarré par worker (hook gunicorn post_worker_init), à défaut
+    à la première requête du process : un thread lancé pendant le preload
+    gunicorn ne survit pas au fork.
+    """
+    def __init__(self, window_s: float, max_size: int):
+        self._window_s = window_s
+        self._max_size = max_size
+        self._queue: queue.Queue | None = None
+        self._lock = threading.Lock()
+        self._pid = None
+ 
+    def submit(self, x_row: np.ndarray) -> float:
+        self.start()
+        fut: Future = Future()
+        self._queue.put((x_row, fut))
+        return fut.result()
+ 
+    def start(self) -> None:
+        """
+        Démarre le thread de batch du process courant (idempotent).
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        # verrou créé dans le master (avant monkey-patch gevent) : verrou OS, on ne le
+        # garde que le temps de publier la queue, sans rien qui cède la main à un greenlet
+        with self._lock:
+            if self._pid == pid:
+                return
+            # queue créée dans le worker : après le monkey-patch si worker gevent
+            q = queue.Queue()
+            self._queue = q
+            self._pid = pid
+        # hors verrou : sous gevent, Thread.start() bascule vers les autres greenlets ;
+        # les lignes soumises d'ici là attendent dans la queue
+        threading.Thread(target=self._run, args=(q,), name="pred-microbatch", daemon=True).start()
+ 
+    def _run(self, q: queue.Queue) -> None:
+        while True:
+            items = [q.get()]
+            deadline = time.monotonic() + self._window_s
+            while len(items) < self._max_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(q.get(timeout=timeout))
+                except queue.Empty:
+                    break
+ 
+            try:
+                probas = _predict_rows(np.stack([x for x, _ in items]))
+            except Exception as e:
+                for _, fut in items:
+                    fut.set_exception(e)
+                continue
+ 
+            for (_, fut), p in zip(items, probas):
+                fut.set_result(float(p))
+ 
+ 
+PRED_BATCHER = (
+    _MicroBatcher(MICROBATCH_WINDOW_MS / 1000.0, MICROBATCH_MAX_SIZE)
+    if MICROBATCH_WINDOW_MS > 0 else None
+)
+# exposé pour le hook post_worker_init de gunicorn.conf.py
+app.extensions["pred_batcher"] = PRED_BATCHER
  
  
 def _predict_risk_score(x: np.ndarray) -> float:
@@ -207,12 +477,10 @@ def _predict_risk_score(x: np.ndarray) -> float:
     Score de risque = proba classe 1.
     On interprète classe 1 comme RISQUE (refus).
     """
-    x_in = scaler.transform(x) if USES_SCALER else x
- 
     if not hasattr(model, "predict_proba"):
         raise AttributeError("Le modèle ne supporte pas predict_proba().")
  
-    return float(model.predict_proba(x_in)[0, 1])
+    return _cached_risk_score(np.ascontiguousarray(x, dtype=FEATURE_DTYPE).tobytes())
  
  
 # -----------------------------
@@ -274,9 +542,21 @@ def predict():
     }
     """
     try:
-        data = request.get_json(silent=True)
-        if data is None:
+        # même contrôle que get_json() : seul un Content-Type JSON est accepté
+        # (un text/plain serait une "simple request" CORS, sans preflight)
+        if not request.is_json:
+            return _json_error("Body JSON manquant", 400)
+
+        # parsing orjson direct (pas de copie du body conservée par Flask)
+        raw = request.get_data(cache=False)
+        if not raw:
             return _json_error("Body JSON manquant", 400)
+        try:
+            data = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return _json_error("Body JSON invalide", 400)
+        if not isinstance(data, dict):
+            return _json_error("Body JSON invalide", 400)
  
         # ------- Validations minimum
         revenu = _to_float(data.get("revenu_mensuel", 0), 0)
@@ -338,6 +618,12 @@ def predict():
         # features -> modèle
         X = _business_to_features(
             data,
+            revenu=revenu,
+            charges=charges,
+            credits=credits,
+            montant_credit=montant_credit,
+            duree_credit=duree_credit,
+            objet_credit=objet_credit,
             mensualite_credit=mensualite_credit,
             taux_endettement_after=taux_endettement_after,
             reste_a_vivre_after=reste_a_vivre_after
@@ -411,8 +697,8 @@ def predict():
                 "enabled": True,
                 "forced_refusal": bool(guardrail_reasons),
                 "reasons": guardrail_reasons,
-                "max_debt_ratio_after": _to_float(data.get("max_debt_ratio_after", DEFAULT_MAX_DEBT_RATIO_AFTER), DEFAULT_MAX_DEBT_RATIO_AFTER),
-                "min_reste_a_vivre_after": _to_float(data.get("min_reste_a_vivre_after", DEFAULT_MIN_RESTE_A_VIVRE_AFTER), DEFAULT_MIN_RESTE_A_VIVRE_AFTER),
+                "max_debt_ratio_after": max_debt_ratio_after,
+                "min_reste_a_vivre_after": min_reste_after,
             }
  
         if bool(data.get("debug", False)) is True:
@@ -422,6 +708,8 @@ def predict():
  
         return jsonify(payload)
  
+    except RequestEntityTooLarge:
+        return _json_error("Body JSON trop volumineux", 413, max_bytes=MAX_BODY_BYTES)
     except AttributeError as e:
         return _json_error(str(e), 500)
     except ValueError as e:
@@ -432,8 +720,10 @@ def predict():
  
 # -----------------------------
 # Run
+# Production : via gunicorn (voir api/gunicorn.conf.py)
+#   gunicorn -c api/gunicorn.conf.py api.app:app
+# En local : python api/app.py (serveur de dev Flask, ignoré par gunicorn)
 # -----------------------------
 if __name__ == "__main__":
-    import os
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True)
+    app.run(host="0.0.0.0", port=port)
@@ -0,0 +1,42 @@
+# api/gunicorn.conf.py
+"""
+Configuration gunicorn de l'API.
+
+Lancement (depuis la racine du repo) :
+    gunicorn -c api/gunicorn.conf.py api.app:app
+
+En local, le serveur de dev Flask reste disponible :
+    flask --app api.app run --debug
+"""
+import multiprocessing
+import os
+
+# L'inférence (scaler + predict_proba) est CPU-bound : 1 worker par cœur
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# Workers gevent : un worker ne reste pas bloqué sur l'I/O réseau d'un client lent
+# et accepte les requêtes suivantes pendant ce temps. Seul, gevent n'ajoute pas de
+# parallélisme CPU (d'où workers ≈ nb de cœurs) ; combiné à MICROBATCH_WINDOW_MS,
+# les requêtes en attente dans un worker partagent un même predict_proba.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 200))
+
+# Workers gthread uniquement (GUNICORN_WORKER_CLASS=gthread) : threads par worker
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+
+# Modèle + scaler chargés une seule fois dans le master puis partagés (COW) avec les workers
+preload_app = True
+
+# Un seul thread BLAS/OpenMP par worker : évite l'oversubscription workers × threads > cœurs.
+# Doit être positionné avant l'import de numpy/lightgbm (donc avant le preload de l'app).
+for _var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+
+def post_worker_init(worker):
+    # Démarre le micro-batcher dans chaque worker forké, avant la 1re requête
+    # (après le monkey-patch si worker gevent). Sans effet si MICROBATCH_WINDOW_MS=0.
+    batcher = getattr(worker.wsgi, "extensions", {}).get("pred_batcher")
+    if batcher is not None:
+        batcher.start()
@@ -0,0 +1,63 @@
+# api/test_microbatcher.py
+"""
+Régression micro-batching : première rafale de /predict concurrents juste après
+le fork d'un worker gevent (app préchargée dans le master, comme avec gunicorn).
+
+Lancement (depuis la racine du repo) :
+    python -m pytest api/test_microbatcher.py
+"""
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("gevent")
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="fork requis")
+
+API_DIR = Path(__file__).resolve().parent
+
+# Le process enfant reproduit gunicorn --preload + worker gevent :
+# import de l'app (master) -> fork -> monkey-patch -> N greenlets qui soumettent en même temps.
+_SCRIPT = textwrap.dedent("""
+    import os, sys
+    import numpy as np
+    import app as api
+
+    pid = os.fork()
+    if pid == 0:
+        from gevent import monkey
+        monkey.patch_all()
+        import gevent
+
+        n = int(sys.argv[1])
+        rows = [np.full(api.N_FEATURES, i, dtype=api.FEATURE_DTYPE) for i in range(n)]
+        jobs = [gevent.spawn(api.PRED_BATCHER.submit, r) for r in rows]
+        gevent.joinall(jobs, timeout=10)
+        ok = all(j.successful() and 0.0 <= j.value <= 1.0 for j in jobs)
+        os._exit(0 if ok else 1)
+
+    # un worker bloqué ne rend jamais la main : on le tue au bout de 20 s
+    import time
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            sys.exit(os.waitstatus_to_exitcode(status))
+        time.sleep(0.05)
+    os.kill(pid, 9)
+    os.waitpid(pid, 0)
+    sys.exit("worker bloqué (timeout)")
+""")
+
+
+@pytest.mark.parametrize("n_requests", [1, 40])
+def test_first_burst_after_fork_does_not_hang(n_requests):
+    env = {**os.environ, "MICROBATCH_WINDOW_MS": "5", "PRED_CACHE_DIR": ""}
+    proc = subprocess.run(
+        [sys.executable, "-c", _SCRIPT, str(n_requests)],
+        cwd=API_DIR, env=env, timeout=60, capture_output=True, text=True,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
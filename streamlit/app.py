@@ -1,7 +1,12 @@
 # frontend/streamlit_app.py
+import math
+
+import orjson
 import streamlit as st
 import requests
-from typing import Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Optional
 
 # ==================== CONFIG PAGE ====================
 st.set_page_config(
@@ -11,20 +16,26 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# ==================== CSS (AMÉLIORÉ MAIS MÊME UI) ====================
-PRIMARY = "#EC0000"
-BORDER = "#E6E8F0"
-BG = "#F5F6FA"
-CARD = "#FFFFFF"
-TXT = "#111827"
-MUTED = "#6B7280"
-SUCCESS_BG = "#EAF7EE"
-SUCCESS_BORDER = "#22C55E"
-DANGER_BG = "#FDECEC"
-DANGER_BORDER = "#EF4444"
-INFO_BG = "#F0F2F6"
-
-st.markdown(f"""
+# ==================== ASSETS STATIQUES (CSS AMÉLIORÉ MAIS MÊME UI) ====================
+@st.cache_resource
+def _static_assets() -> Dict[str, Any]:
+    """
+    CSS, en-tête et libellés d'étapes construits une seule fois par process :
+    ni f-string ni littéraux reconstruits à chaque rerun.
+    """
+    PRIMARY = "#EC0000"
+    BORDER = "#E6E8F0"
+    BG = "#F5F6FA"
+    CARD = "#FFFFFF"
+    TXT = "#111827"
+    MUTED = "#6B7280"
+    SUCCESS_BG = "#EAF7EE"
+    SUCCESS_BORDER = "#22C55E"
+    DANGER_BG = "#FDECEC"
+    DANGER_BORDER = "#EF4444"
+    INFO_BG = "#F0F2F6"
+
+    css = f"""
 <style>
 .stApp {{
     background: {BG};
@@ -104,10 +115,69 @@ section[data-testid="stSidebar"] {{
     border-right: 1px solid {BORDER};
 }}
 </style>
-""", unsafe_allow_html=True)
+"""
+    return {
+        "css": css,
+        "header_html": '<h1 class="main-header">🏦 Santander - Simulation de Crédit</h1>',
+        # index = numéro d'étape
+        "etapes": (
+            "🏁 Accueil",
+            "👤 Informations Personnelles",
+            "💼 Situation Professionnelle",
+            "💰 Situation Financière",
+            "📋 Détails du Crédit",
+            "🎯 Résultat",
+        ),
+    }
+
+
+ASSETS = _static_assets()
+
+# ré-émise à chaque rerun : Streamlit retire du DOM tout élément non rendu pendant le run
+st.markdown(ASSETS["css"], unsafe_allow_html=True)
 
 # ==================== API CONFIG ====================
 API_URL = "https://santander-project-api.onrender.com"
+API_TIMEOUT = (3.05, 15)  # (connexion, lecture) en secondes
+
+
+@st.cache_resource
+def get_http() -> requests.Session:
+    """Session HTTP partagée (keep-alive) : pas de nouvelle connexion TCP/TLS à chaque rerun."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=2,
+            read=0,  # pas de re-POST après un timeout de lecture : une API lente = 15 s, pas 3 × 15 s
+            backoff_factor=0.1,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=frozenset({"GET", "POST"}),  # /predict est sans effet de bord
+            raise_on_status=False,
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# ==================== OPTIONS FORMULAIRE ====================
+# tuples + index {option: position} : pas de liste reconstruite ni de .index() à chaque rerun
+RESIDENCE_OPTS = ("Propriétaire", "Locataire", "Hébergé gratuitement", "Autre")
+STATUT_PRO_OPTS = ("CDI", "CDD", "Intérimaire", "Indépendant", "Fonctionnaire", "Retraité", "Sans emploi", "Étudiant")
+SECTEUR_OPTS = ("Agriculture", "Commerce", "Construction", "Éducation", "Finance", "Industrie",
+                "Santé", "Services", "Technologies", "Transport", "Autre")
+DUREE_CREDIT_OPTS = (12, 24, 36, 48, 60, 72, 84, 96, 120, 180, 240, 300)
+OBJET_CREDIT_OPTS = ("Achat immobilier", "Travaux", "Véhicule", "Consommation", "Trésorerie", "Autre")
+
+RESIDENCE_IDX = {o: i for i, o in enumerate(RESIDENCE_OPTS)}
+STATUT_PRO_IDX = {o: i for i, o in enumerate(STATUT_PRO_OPTS)}
+SECTEUR_IDX = {o: i for i, o in enumerate(SECTEUR_OPTS)}
+DUREE_CREDIT_IDX = {o: i for i, o in enumerate(DUREE_CREDIT_OPTS)}
+OBJET_CREDIT_IDX = {o: i for i, o in enumerate(OBJET_CREDIT_OPTS)}
+
+# statut_pro stocké aussi sous forme de code entier (= index dans STATUT_PRO_OPTS)
+SANS_EMPLOI_CODE = STATUT_PRO_IDX["Sans emploi"]
 
 # ==================== SESSION STATE ====================
 if "etape" not in st.session_state:
@@ -116,125 +186,180 @@ if "donnees" not in st.session_state:
     st.session_state.donnees = {}
 
 # ==================== API CALL ====================
+# champs métier envoyés tels quels à /predict (None si absents)
+_PAYLOAD_KEYS = (
+    "age", "statut_pro", "anciennete_pro", "revenu_mensuel",
+    "charges_mensuelles", "credits_encours", "annees_residence",
+    # crédit demandé (OBLIGATOIRE)
+    "montant_credit", "duree_credit", "objet_credit",
+)
+# optionnels -> valeur par défaut
+_PAYLOAD_DEFAULTS = {
+    "taux_annuel": 0.035,
+    "threshold": 0.5,
+    "agent_adjustment": 0.0,
+    "agent_comment": "",
+    "use_guardrails": False,
+    "max_debt_ratio_after": 0.45,
+    "min_reste_a_vivre_after": 0,
+    "debug": False,
+}
+
+
+@st.cache_data(ttl=300, max_entries=128, show_spinner=False)
+def _cached_predict(payload_items: tuple) -> Dict[str, Any]:
+    """
+    POST /predict mémoïsé sur le payload : les reruns Streamlit d'une même simulation
+    ne refont pas l'appel réseau. Une réponse non-200 lève HTTPError (jamais mise en cache).
+    """
+    return _post_json("/predict", dict(payload_items))
+
+
+def _post_json(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """POST JSON encodé/décodé avec orjson (au lieu du json standard utilisé par requests)."""
+    response = get_http().post(
+        f"{API_URL}{path}",
+        data=orjson.dumps(payload),
+        headers={"Content-Type": "application/json"},
+        timeout=API_TIMEOUT,
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
 def appeler_api_prediction(donnees: Dict[str, Any]) -> Dict[str, Any]:
-    payload = {
-        "age": donnees.get("age"),
-        "statut_pro": donnees.get("statut_pro"),
-        "anciennete_pro": donnees.get("anciennete_pro"),
-        "revenu_mensuel": donnees.get("revenu_mensuel"),
-        "charges_mensuelles": donnees.get("charges_mensuelles"),
-        "credits_encours": donnees.get("credits_encours"),
-        "annees_residence": donnees.get("annees_residence"),
-
-        # crédit demandé (OBLIGATOIRE)
-        "montant_credit": donnees.get("montant_credit"),
-        "duree_credit": donnees.get("duree_credit"),
-        "objet_credit": donnees.get("objet_credit"),
-
-        # optionnels
-        "taux_annuel": donnees.get("taux_annuel", 0.035),
-        "threshold": donnees.get("threshold", 0.5),
-        "agent_adjustment": donnees.get("agent_adjustment", 0.0),
-        "agent_comment": donnees.get("agent_comment", ""),
-        "use_guardrails": donnees.get("use_guardrails", False),
-        "max_debt_ratio_after": donnees.get("max_debt_ratio_after", 0.45),
-        "min_reste_a_vivre_after": donnees.get("min_reste_a_vivre_after", 0),
-        "debug": donnees.get("debug", False),
-    }
+    payload = {k: donnees.get(k) for k in _PAYLOAD_KEYS}
+    payload.update({k: donnees.get(k, v) for k, v in _PAYLOAD_DEFAULTS.items()})
 
     try:
-        response = requests.post(f"{API_URL}/predict", json=payload, timeout=15)
-        if response.status_code == 200:
-            return {"success": True, "data": response.json()}
-        else:
-            try:
-                err = response.json()
-            except Exception:
-                err = {"error": response.text}
-            return {"success": False, "error": err, "status_code": response.status_code}
+        return {"success": True, "data": _cached_predict(tuple(sorted(payload.items())))}
+    except requests.exceptions.HTTPError as e:
+        response = e.response
+        try:
+            err = response.json()
+        except Exception:
+            err = {"error": response.text}
+        return {"success": False, "error": err, "status_code": response.status_code}
     except requests.exceptions.ConnectionError:
         return {"success": False, "error": {"error": f"Impossible de se connecter à l'API ({API_URL}). Lance Flask."}}
     except Exception as e:
         return {"success": False, "error": {"error": str(e)}}
 
+# ==================== CALCUL CRÉDIT ====================
+def calculer_mensualite(montant: float, taux_annuel: float, n: int) -> float:
+    """Mensualité d'un crédit amortissable (même formule que l'API)."""
+    taux_mensuel = taux_annuel / 12.0
+    if taux_mensuel <= 0:
+        return montant / n
+    # (1 + t)^n - 1 via expm1/log1p : un seul calcul, stable pour les petits taux
+    p_moins_1 = math.expm1(n * math.log1p(taux_mensuel))
+    return montant * taux_mensuel * (1 + p_moins_1) / p_moins_1
+
 # ==================== FALLBACK RAISON (si API n'envoie pas reason) ====================
 def generer_raison_fallback(d: Dict[str, Any], api: Dict[str, Any]) -> str:
-    decision = api.get("decision", 0)
-    kpis = api.get("kpis", {}) or {}
+    if api.get("decision", 0) == 1:
+        return "Votre dossier est compatible avec nos critères."
+
     revenu = float(d.get("revenu_mensuel", 0) or 0)
-    charges = float(d.get("charges_mensuelles", 0) or 0)
-    credits = float(d.get("credits_encours", 0) or 0)
-    mensualite = float(d.get("mensualite_estimee", 0) or 0)
-    statut = str(d.get("statut_pro", "")).strip()
+    if revenu <= 0:
+        return "Revenu mensuel nul ou inexistant."
 
+    # KPIs de l'API en priorité ; recalcul local seulement s'ils manquent
+    kpis = api.get("kpis", {}) or {}
     taux_after = kpis.get("taux_endettement_after", None)
     reste_after = kpis.get("reste_a_vivre_after", None)
+    if taux_after is None or reste_after is None:
+        engagements = (
+            float(d.get("charges_mensuelles", 0) or 0)
+            + float(d.get("credits_encours", 0) or 0)
+            + float(d.get("mensualite_estimee", 0) or 0)
+        )
+        if taux_after is None:
+            taux_after = engagements / revenu
+        if reste_after is None:
+            reste_after = revenu - engagements
 
-    if taux_after is None and revenu > 0:
-        taux_after = (charges + credits + mensualite) / revenu
-    if reste_after is None:
-        reste_after = revenu - charges - credits - mensualite
-
-    if decision == 1:
-        return "Votre dossier est compatible avec nos critères."
-
-    if revenu <= 0:
-        return "Revenu mensuel nul ou inexistant."
-    if taux_after is not None and taux_after > 0.45:
+    if taux_after > 0.45:
         return "Taux d’endettement après crédit trop élevé (> 45%)."
-    if statut == "Sans emploi":
+    if d.get("statut_pro_code") == SANS_EMPLOI_CODE:
         return "Situation professionnelle jugée instable."
-    if reste_after is not None and reste_after < 200:
+    if reste_after < 200:
         return "Reste à vivre après crédit insuffisant."
 
     return "Critères d’éligibilité non atteints pour ce montant/durée."
 
-# ==================== HEADER ====================
-st.markdown('<h1 class="main-header">🏦 Santander - Simulation de Crédit</h1>', unsafe_allow_html=True)
-
-# ==================== SIDEBAR ====================
-with st.sidebar:
-    st.markdown("### Navigation")
+# ==================== REFUS CERTAIN (sans appel API) ====================
+def _quick_reject(d: Dict[str, Any]) -> Optional[str]:
+    """
+    Raison du refus si l'API refuserait forcément le dossier, sinon None.
+    Ne reprend que les règles que /predict applique de toute façon :
+    revenu nul (refus direct) ; endettement > 45% ou reste à vivre < 200 €
+    (l'API exige endettement <= 35% et reste à vivre >= 800 €).
+    """
+    revenu = float(d.get("revenu_mensuel", 0) or 0)
+    if revenu <= 0:
+        return generer_raison_fallback(d, {"decision": 0})
 
-    etapes = {
-        0: "🏁 Accueil",
-        1: "👤 Informations Personnelles",
-        2: "💼 Situation Professionnelle",
-        3: "💰 Situation Financière",
-        4: "📋 Détails du Crédit",
-        5: "🎯 Résultat"
-    }
+    charges = float(d.get("charges_mensuelles", 0) or 0)
+    credits = float(d.get("credits_encours", 0) or 0)
+    mensualite = float(d.get("mensualite_estimee", 0) or 0)
+    taux_after = (charges + credits + mensualite) / revenu
+    reste_after = revenu - charges - credits - mensualite
+    if taux_after <= 0.45 and reste_after >= 200:
+        return None
+    # KPIs déjà calculés transmis : pas de 2e conversion/somme dans le fallback
+    return generer_raison_fallback(d, {
+        "decision": 0,
+        "kpis": {"taux_endettement_after": taux_after, "reste_a_vivre_after": reste_after},
+    })
 
-    for num, titre in etapes.items():
-        if num == st.session_state.etape:
-            st.markdown(f"**➤ {titre}**")
-        elif num < st.session_state.etape:
-            st.markdown(f"✅ {titre}")
-        else:
-            st.markdown(f"⚪ {titre}")
+# ==================== HEADER ====================
+st.markdown(ASSETS["header_html"], unsafe_allow_html=True)
 
-    st.markdown("---")
+# ==================== SIDEBAR ====================
+@st.fragment
+def _parametres_agent() -> None:
+    """
+    Sliders agent isolés dans un fragment : les déplacer ne relance que ce bloc,
+    pas tout le script. Les valeurs sont reprises au prochain rerun complet
+    (ex. passage à l'étape 5 -> payload /predict).
+    """
+    d = st.session_state.donnees
     st.markdown("### 🧑‍💼 Paramètres Agent")
 
     threshold = st.slider(
         "Seuil décision (threshold)",
         0.0, 1.0,
-        float(st.session_state.donnees.get("threshold", 0.5)),
+        float(d.get("threshold", 0.5)),
         0.01
     )
 
     agent_adjustment = st.slider(
         "Ajustement agent",
         -0.30, 0.30,
-        float(st.session_state.donnees.get("agent_adjustment", 0.0)),
+        float(d.get("agent_adjustment", 0.0)),
         0.01
     )
 
-    st.session_state.donnees.update({
+    d.update({
         "threshold": threshold,
         "agent_adjustment": agent_adjustment,
     })
 
+
+with st.sidebar:
+    st.markdown("### Navigation")
+
+    # un seul élément markdown pour toute la navigation
+    etape = st.session_state.etape
+    st.markdown("\n\n".join(
+        f"**➤ {titre}**" if num == etape else (f"✅ {titre}" if num < etape else f"⚪ {titre}")
+        for num, titre in enumerate(ASSETS["etapes"])
+    ))
+
+    st.markdown("---")
+    _parametres_agent()
+
     st.markdown("---")
     if st.button("🔄 Recommencer", use_container_width=True):
         st.session_state.etape = 0
@@ -242,12 +367,15 @@ with st.sidebar:
         st.rerun()
 
 # ==================== PROGRESS ====================
-if st.session_state.etape == 0:
-    st.progress(0.0)
-else:
-    progress = (st.session_state.etape - 1) / 4
-    st.progress(progress)
-st.markdown(f"**Étape {st.session_state.etape} sur 5**" if st.session_state.etape else "**Accueil**")
+# 6 états possibles : valeurs précalculées, indexées par numéro d'étape
+_PROGRESS = (0.0, 0.0, 0.25, 0.5, 0.75, 1.0)
+_STEP_LABEL = (
+    "**Accueil**", "**Étape 1 sur 5**", "**Étape 2 sur 5**",
+    "**Étape 3 sur 5**", "**Étape 4 sur 5**", "**Étape 5 sur 5**",
+)
+
+st.progress(_PROGRESS[st.session_state.etape])
+st.markdown(_STEP_LABEL[st.session_state.etape])
 
 # ==================== ACCUEIL ====================
 if st.session_state.etape == 0:
@@ -267,35 +395,38 @@ if st.session_state.etape == 0:
 
 # ==================== ETAPE 1 ====================
 if st.session_state.etape == 1:
+    d = st.session_state.donnees
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown('<h2 class="step-header">👤 Informations Personnelles</h2>', unsafe_allow_html=True)
 
-    col1, col2 = st.columns(2)
-    with col1:
-        nom = st.text_input("Nom *", value=st.session_state.donnees.get("nom", ""), placeholder="Dupont")
-        prenom = st.text_input("Prénom *", value=st.session_state.donnees.get("prenom", ""), placeholder="Jean")
-        age = st.number_input("Âge *", 18, 100, int(st.session_state.donnees.get("age", 30)))
-    with col2:
-        residence = st.selectbox(
-            "Type de résidence *",
-            ["Propriétaire", "Locataire", "Hébergé gratuitement", "Autre"],
-            index=["Propriétaire", "Locataire", "Hébergé gratuitement", "Autre"].index(
-                st.session_state.donnees.get("residence", "Locataire")
+    # formulaire : un seul rerun à la validation (pas un par saisie)
+    with st.form("etape_1", border=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            nom = st.text_input("Nom *", value=d.get("nom", ""), placeholder="Dupont")
+            prenom = st.text_input("Prénom *", value=d.get("prenom", ""), placeholder="Jean")
+            age = st.number_input("Âge *", 18, 100, int(d.get("age", 30)))
+        with col2:
+            residence = st.selectbox(
+                "Type de résidence *",
+                RESIDENCE_OPTS,
+                index=RESIDENCE_IDX.get(d.get("residence", "Locataire"), 1)
             )
-        )
-        annees_residence = st.number_input(
-            "Années à l'adresse actuelle *",
-            0, 50, int(st.session_state.donnees.get("annees_residence", 2))
+            annees_residence = st.number_input(
+                "Années à l'adresse actuelle *",
+                0, 50, int(d.get("annees_residence", 2))
+            )
+
+        st.markdown(
+            "<div class='info-box'>ℹ️ Tous les champs marqués d’un * sont obligatoires.</div>",
+            unsafe_allow_html=True
         )
 
-    st.markdown(
-        "<div class='info-box'>ℹ️ Tous les champs marqués d’un * sont obligatoires.</div>",
-        unsafe_allow_html=True
-    )
+        suivant = st.form_submit_button("Suivant ➡️", type="primary", use_container_width=True)
 
-    if st.button("Suivant ➡️", type="primary", use_container_width=True):
+    if suivant:
         if nom and prenom:
-            st.session_state.donnees.update({
+            d.update({
                 "nom": nom,
                 "prenom": prenom,
                 "age": age,
@@ -311,52 +442,53 @@ if st.session_state.etape == 1:
 
 # ==================== ETAPE 2 ====================
 elif st.session_state.etape == 2:
+    d = st.session_state.donnees
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown('<h2 class="step-header">💼 Situation Professionnelle</h2>', unsafe_allow_html=True)
 
-    col1, col2 = st.columns(2)
-    with col1:
-        statut_pro = st.selectbox(
-            "Statut professionnel *",
-            ["CDI", "CDD", "Intérimaire", "Indépendant", "Fonctionnaire", "Retraité", "Sans emploi", "Étudiant"],
-            index=["CDI", "CDD", "Intérimaire", "Indépendant", "Fonctionnaire", "Retraité", "Sans emploi", "Étudiant"].index(
-                st.session_state.donnees.get("statut_pro", "CDI")
+    with st.form("etape_2", border=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            statut_pro = st.selectbox(
+                "Statut professionnel *",
+                STATUT_PRO_OPTS,
+                index=STATUT_PRO_IDX.get(d.get("statut_pro", "CDI"), 0)
             )
-        )
-        secteur = st.selectbox(
-            "Secteur d'activité *",
-            ["Agriculture", "Commerce", "Construction", "Éducation", "Finance", "Industrie",
-             "Santé", "Services", "Technologies", "Transport", "Autre"],
-            index=["Agriculture", "Commerce", "Construction", "Éducation", "Finance", "Industrie",
-                   "Santé", "Services", "Technologies", "Transport", "Autre"].index(
-                st.session_state.donnees.get("secteur", "Services")
+            secteur = st.selectbox(
+                "Secteur d'activité *",
+                SECTEUR_OPTS,
+                index=SECTEUR_IDX.get(d.get("secteur", "Services"), 7)
+            )
+        with col2:
+            anciennete_pro = st.number_input(
+                "Ancienneté professionnelle (en mois) *",
+                0, 600, int(d.get("anciennete_pro", 24))
             )
-        )
-    with col2:
-        anciennete_pro = st.number_input(
-            "Ancienneté professionnelle (en mois) *",
-            0, 600, int(st.session_state.donnees.get("anciennete_pro", 24))
-        )
 
-    colA, colB = st.columns(2)
-    with colA:
-        if st.button("⬅️ Précédent", use_container_width=True):
-            st.session_state.etape = 1
-            st.rerun()
-    with colB:
-        if st.button("Suivant ➡️", type="primary", use_container_width=True):
-            st.session_state.donnees.update({
-                "statut_pro": statut_pro,
-                "secteur": secteur,
-                "anciennete_pro": anciennete_pro
-            })
-            st.session_state.etape = 3
-            st.rerun()
+        colA, colB = st.columns(2)
+        with colA:
+            precedent = st.form_submit_button("⬅️ Précédent", use_container_width=True)
+        with colB:
+            suivant = st.form_submit_button("Suivant ➡️", type="primary", use_container_width=True)
+
+    if precedent:
+        st.session_state.etape = 1
+        st.rerun()
+    if suivant:
+        d.update({
+            "statut_pro": statut_pro,
+            "statut_pro_code": STATUT_PRO_IDX[statut_pro],
+            "secteur": secteur,
+            "anciennete_pro": anciennete_pro
+        })
+        st.session_state.etape = 3
+        st.rerun()
 
     st.markdown("</div>", unsafe_allow_html=True)
 
 # ==================== ETAPE 3 ====================
 elif st.session_state.etape == 3:
+    d = st.session_state.donnees
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown('<h2 class="step-header">💰 Situation Financière</h2>', unsafe_allow_html=True)
 
@@ -364,18 +496,18 @@ elif st.session_state.etape == 3:
     with col1:
         revenu_mensuel = st.number_input(
             "Revenu mensuel net (€) *",
-            0, 50000, int(st.session_state.donnees.get("revenu_mensuel", 2000)),
+            0, 50000, int(d.get("revenu_mensuel", 2000)),
             step=100
         )
         credits_encours = st.number_input(
             "Crédits en cours (mensualités) (€) *",
-            0, 500000, int(st.session_state.donnees.get("credits_encours", 0)),
+            0, 500000, int(d.get("credits_encours", 0)),
             step=100
         )
     with col2:
         charges_mensuelles = st.number_input(
             "Charges mensuelles (€) *",
-            0, 10000, int(st.session_state.donnees.get("charges_mensuelles", 800)),
+            0, 10000, int(d.get("charges_mensuelles", 800)),
             step=50
         )
 
@@ -395,7 +527,7 @@ elif st.session_state.etape == 3:
             st.rerun()
     with colB:
         if st.button("Suivant ➡️", type="primary", use_container_width=True):
-            st.session_state.donnees.update({
+            d.update({
                 "revenu_mensuel": revenu_mensuel,
                 "credits_encours": credits_encours,
                 "charges_mensuelles": charges_mensuelles
@@ -407,6 +539,7 @@ elif st.session_state.etape == 3:
 
 # ==================== ETAPE 4 ====================
 elif st.session_state.etape == 4:
+    d = st.session_state.donnees
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown('<h2 class="step-header">📋 Détails du Crédit Demandé</h2>', unsafe_allow_html=True)
 
@@ -414,38 +547,29 @@ elif st.session_state.etape == 4:
     with col1:
         montant_credit = st.number_input(
             "Montant du crédit demandé (€) *",
-            1000, 500000, int(st.session_state.donnees.get("montant_credit", 10000)),
+            1000, 500000, int(d.get("montant_credit", 10000)),
             step=1000
         )
         duree_credit = st.selectbox(
             "Durée du crédit (mois) *",
-            [12, 24, 36, 48, 60, 72, 84, 96, 120, 180, 240, 300],
-            index=[12, 24, 36, 48, 60, 72, 84, 96, 120, 180, 240, 300].index(
-                int(st.session_state.donnees.get("duree_credit", 60))
-            )
+            DUREE_CREDIT_OPTS,
+            index=DUREE_CREDIT_IDX.get(int(d.get("duree_credit", 60)), 4)
         )
     with col2:
         objet_credit = st.selectbox(
             "Objet du crédit *",
-            ["Achat immobilier", "Travaux", "Véhicule", "Consommation", "Trésorerie", "Autre"],
-            index=["Achat immobilier", "Travaux", "Véhicule", "Consommation", "Trésorerie", "Autre"].index(
-                st.session_state.donnees.get("objet_credit", "Consommation")
-            )
+            OBJET_CREDIT_OPTS,
+            index=OBJET_CREDIT_IDX.get(d.get("objet_credit", "Consommation"), 3)
         )
 
     st.markdown("---")
     st.markdown("<b>💳 Simulation de mensualité</b>", unsafe_allow_html=True)
-    taux_annuel = float(st.session_state.donnees.get("taux_annuel", 0.035))
-    taux_mensuel = taux_annuel / 12.0
+    taux_annuel = float(d.get("taux_annuel", 0.035))
     n = duree_credit
+    mensualite = calculer_mensualite(montant_credit, taux_annuel, n)
 
-    if taux_mensuel > 0:
-        mensualite = montant_credit * (taux_mensuel * (1 + taux_mensuel) ** n) / ((1 + taux_mensuel) ** n - 1)
-    else:
-        mensualite = montant_credit / n
-
-    st.session_state.donnees["mensualite_estimee"] = mensualite
-    st.session_state.donnees["taux_annuel"] = taux_annuel
+    d["mensualite_estimee"] = mensualite
+    d["taux_annuel"] = taux_annuel
 
     c1, c2, c3 = st.columns(3)
     c1.metric("Mensualité estimée", f"{mensualite:.2f} €")
@@ -459,7 +583,7 @@ elif st.session_state.etape == 4:
             st.rerun()
     with colB:
         if st.button("🎯 Lancer la Simulation", type="primary", use_container_width=True):
-            st.session_state.donnees.update({
+            d.update({
                 "montant_credit": montant_credit,
                 "duree_credit": duree_credit,
                 "objet_credit": objet_credit,
@@ -475,7 +599,12 @@ elif st.session_state.etape == 5:
     st.markdown('<h2 class="step-header">🎯 Résultat de votre Simulation</h2>', unsafe_allow_html=True)
 
     d = st.session_state.donnees
-    res = appeler_api_prediction(d)
+    # refus évident : pas d'aller-retour réseau
+    raison_refus = _quick_reject(d)
+    if raison_refus:
+        res = {"success": True, "data": {"decision": 0, "reason": raison_refus}}
+    else:
+        res = appeler_api_prediction(d)
 
     if not res["success"]:
         st.error("❌ Erreur lors de l'appel à l'API /predict")
@@ -519,23 +648,28 @@ elif st.session_state.etape == 5:
     st.markdown("### 📋 Récapitulatif")
 
     col1, col2 = st.columns(2)
+    # un bloc markdown par colonne (au lieu d'un élément par ligne)
     with col1:
-        st.markdown("**👤 Personnel**")
-        st.write(f"Nom : {d.get('nom')} {d.get('prenom')}")
-        st.write(f"Âge : {d.get('age')} ans")
-        st.write(f"Résidence : {d.get('residence')}")
-        st.write(f"Années à l'adresse : {d.get('annees_residence')}")
-        st.markdown("**💼 Professionnel**")
-        st.write(f"Statut : {d.get('statut_pro')}")
-        st.write(f"Secteur : {d.get('secteur')}")
-        st.write(f"Ancienneté : {d.get('anciennete_pro')} mois")
+        st.markdown("\n\n".join([
+            "**👤 Personnel**",
+            f"Nom : {d.get('nom')} {d.get('prenom')}",
+            f"Âge : {d.get('age')} ans",
+            f"Résidence : {d.get('residence')}",
+            f"Années à l'adresse : {d.get('annees_residence')}",
+            "**💼 Professionnel**",
+            f"Statut : {d.get('statut_pro')}",
+            f"Secteur : {d.get('secteur')}",
+            f"Ancienneté : {d.get('anciennete_pro')} mois",
+        ]))
 
     with col2:
-        st.markdown("**💰 Financier**")
-        st.write(f"Revenu : {d.get('revenu_mensuel')} €")
-        st.write(f"Charges : {d.get('charges_mensuelles')} €")
-        st.write(f"Crédits en cours : {d.get('credits_encours')} €")
-        st.write(f"Mensualité estimée : {d.get('mensualite_estimee'):.2f} €")
+        st.markdown("\n\n".join([
+            "**💰 Financier**",
+            f"Revenu : {d.get('revenu_mensuel')} €",
+            f"Charges : {d.get('charges_mensuelles')} €",
+            f"Crédits en cours : {d.get('credits_encours')} €",
+            f"Mensualité estimée : {d.get('mensualite_estimee'):.2f} €",
+        ]))
 
     st.markdown("---")
     colA, colB = st.columns(2)